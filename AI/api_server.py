@@ -1,20 +1,24 @@
 import openai
+import asyncio
 import base64
+import hashlib
 import json
 import os
 import shutil
 import uuid
 import traceback
-from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Query, Depends, Body, Request
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Query, Depends, Body, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 from pydantic import BaseModel
 
-# .env 파일에서 환경 변수 로드
+# .env 파일에서 환경 변수 로드 (inspection 모듈이 import 시점에 OPENAI_* 설정을 읽으므로 먼저 실행)
 load_dotenv()
 
+from inspection import DESCRIPTION_CALLER, CircuitOpenError, ModelDeadlineExceeded, analyze_image, encode_image
+
 # --- OpenAI API 키 설정 ---
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
@@ -38,8 +42,66 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOADS_BASE_PATH = os.path.join(SCRIPT_DIR, "WEB", "server", "uploads") # SCRIPT_DIR 기준으로 경로 설정
 
 # --- 이미지 캐시 ---
-# { room_id: { "normal": [b64_image1, ...], "abnormal": [b64_image1, ...] } }
+# 룸은 이미지 내용 해시만 들고, Base64 데이터는 IMAGE_BLOBS에서 룸 간에 공유합니다.
+# { room_id: { "normal": [sha256, ...], "abnormal": [sha256, ...] } }
 ROOM_IMAGE_CACHE = {}
+# { sha256: { "b64": b64_image, "refs": 참조하는 룸 이미지 수 } }
+IMAGE_BLOBS = {}
+# { path: (mtime_ns, size, sha256) } — 변경되지 않은 파일은 다시 읽지 않습니다.
+IMAGE_PATH_HASHES = {}
+
+def acquire_image(path: str) -> str:
+    """파일을 내용 해시로 등록하고 참조 수를 늘린 뒤 해시를 반환합니다."""
+    stat = os.stat(path)
+    memo = IMAGE_PATH_HASHES.get(path)
+    if memo and memo[:2] == (stat.st_mtime_ns, stat.st_size) and memo[2] in IMAGE_BLOBS:
+        digest = memo[2]
+    else:
+        with open(path, "rb") as image_file:
+            data = image_file.read()
+        digest = hashlib.sha256(data).hexdigest()
+        IMAGE_PATH_HASHES[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        if digest not in IMAGE_BLOBS:
+            IMAGE_BLOBS[digest] = {"b64": base64.b64encode(data).decode("utf-8"), "refs": 0}
+    IMAGE_BLOBS[digest]["refs"] += 1
+    return digest
+
+def release_image(digest: str):
+    """참조 수를 줄이고, 더 이상 어떤 룸도 쓰지 않으면 데이터를 해제합니다."""
+    blob = IMAGE_BLOBS.get(digest)
+    if blob is None:
+        return
+    blob["refs"] -= 1
+    if blob["refs"] <= 0:
+        del IMAGE_BLOBS[digest]
+
+def cache_room_images(room_id: int, normal_paths: list[str], abnormal_paths: list[str]):
+    """룸의 기준 이미지를 공유 저장소에 등록합니다. 실패하면 이미 늘린 참조를 되돌립니다."""
+    acquired = []
+    try:
+        for path in normal_paths + abnormal_paths:
+            acquired.append(acquire_image(path))
+    except Exception:
+        for digest in acquired:
+            release_image(digest)
+        raise
+    uncache_room_images(room_id)
+    ROOM_IMAGE_CACHE[room_id] = {"normal": acquired[:len(normal_paths)], "abnormal": acquired[len(normal_paths):]}
+
+def uncache_room_images(room_id: int) -> bool:
+    cached_images = ROOM_IMAGE_CACHE.pop(room_id, None)
+    if cached_images is None:
+        return False
+    for digest in cached_images["normal"] + cached_images["abnormal"]:
+        release_image(digest)
+    return True
+
+def get_room_images_b64(room_id: int) -> tuple[list[str], list[str]]:
+    cached_images = ROOM_IMAGE_CACHE[room_id]
+    return (
+        [IMAGE_BLOBS[digest]["b64"] for digest in cached_images["normal"]],
+        [IMAGE_BLOBS[digest]["b64"] for digest in cached_images["abnormal"]],
+    )
 
 # --- API 키 인증을 위한 의존성 주입 ---
 API_KEY_SECRET = os.getenv("AI_API_KEY_SECRET") # .env 파일에 AI_API_KEY_SECRET 추가 필요
@@ -48,11 +110,6 @@ def verify_api_key(x_api_key: str = Header(...)):
         raise HTTPException(status_code=401, detail="Invalid API Key")
     return x_api_key
 
-# --- 이미지 Base64 인코딩 함수 ---
-def encode_image(path: str) -> str:
-    with open(path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
-
 # --- 핵심 분석 로직 함수 ---
 def get_analysis_from_openai(test_image_path: str, normal_imgs_b64: list[str], abnormal_imgs_b64: list[str]) -> dict:
     try:
@@ -61,117 +118,27 @@ def get_analysis_from_openai(test_image_path: str, normal_imgs_b64: list[str], a
         print(f"Error: Required image file not found - {e.filename}")
         raise HTTPException(status_code=500, detail=f"필수 이미지 파일을 찾을 수 없습니다: {e.filename}")
 
-    # OpenAI API에 전달할 메시지 구성
-    messages = [
-        {
-            "role": "system",
-            "content": (
-            "당신은 스위치 전선 결선 상태를 비교하여 판단하는 정밀 시각 AI입니다.\n\n"
-            "정상 여부의 판단 기준은 아래와 같습니다:\n"
-            "1. 전선의 색상, 위치, 개수, 방향이 기준 이미지와 대체로 동일해야 합니다.\n"
-            "2. 전체 결선 구조가 유사하고 연결 실수가 없으면 '정상'으로 판단하십시오.\n"
-            "3. 눈에 띄는 차이, 빠진 선, 다른 위치의 결선이 있으면 '비정상'입니다.\n\n"
-            "4. 문제가 생기거나 분석할 수 없으면 반드시 아래를 출력하세요.:\n"
-            '{\"판단\": \"판독 불가\",\n'
-            '\"이유\": \"이미지를 분석할 수 없습니다.\"\n}'
-            "5. 출력은 반드시 아래 형식에 맞춰주세요. 다른 말은 절대 하지 마세요:\n"
-            '{\"판단\": \"정상 or 비정상\",\n'
-            '\"이유\": \"만약 비정상이라면, 어떤 점이 다른지 단순하고 명확하게 설명하세요. 비정상이라면 예시 이미지를 언급하지 말고, 정상이라면 `해당 없음`으로 표기하세요.\"\n}'
-        )
-        },
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": "이 이미지는 정상적으로 결선된 스위치입니다."}, 
-                {"type": "image_url", "image_url": {"url": f"data:image/jpg;base64,{normal_imgs_b64[0]}"}}
-            ]
-        }
-    ]
-
-    for idx, b64_img in enumerate(abnormal_imgs_b64):
-        messages.append({
-            "role": "user",
-            "content": [
-                {"type": "text", "text": f"이 이미지는 비정상 스위치 예시 {idx+1}입니다."}, 
-                {"type": "image_url", "image_url": {"url": f"data:image/jpg;base64,{b64_img}"}}
-            ]
-        })
-
-    messages.append({
-        "role": "user",
-        "content": [
-            {"type": "text", "text": "이 이미지를 판단해서 위의 양식에 맞춰 답하세요'"},
-            {"type": "image_url", "image_url": {"url": f"data:image/jpg;base64,{test_img_b64}"}}
-        ]
-    })
-
-    try:
-        client = openai.OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0,
-            max_tokens=200,
-        )
-
-        response_content = response.choices[0].message.content if response.choices and response.choices[0].message else None
-
-        if response_content is None:
-            print(f"OpenAI API 응답 content가 None입니다. 전체 응답: {response}")
-            return {"판단": "판독 불가", "이유": "OpenAI API 응답에서 유효한 content를 받지 못했습니다."}
+    client = openai.OpenAI(api_key=api_key)
+    result, _ = analyze_image(client, test_img_b64, normal_imgs_b64, abnormal_imgs_b64)
 
-        try:
-            response_data = json.loads(response_content)
-        except json.JSONDecodeError as e:
-            print(f"JSON 파싱 오류: {e}\n응답 내용: {response_content}")
-            return {"판단": "판독 불가", "이유": f"{response_content[:200]}"}
-        except Exception as e:
-            print(f"예상치 못한 파싱 오류: {e}\n응답 내용: {response_content}")
-            traceback.print_exc()
-            return {"판단": "판독 불가", "이유": f"예상치 못한 파싱 오류: {e}"}
+    judgment = result["판단"]
+    print("\n" + "-"*20)
+    print(f" 판단 결과: {judgment}")
+    if judgment != "정상":
+        print(f" 판단 이유: {result['이유']}")
+    print("-" * 20)
 
-        judgment = response_data.get("판단", "오류")
-        reason = response_data.get("이유", "이유를 파악할 수 없음")
-
-        print("\n" + "-"*20)
-        print(f" 판단 결과: {judgment}")
-        if judgment != "정상":
-            print(f" 판단 이유: {reason}")
-        print("-" * 20)
-
-        return {"판단": judgment, "이유": reason}
-
-    except openai.APIError as e:
-        print(f"OpenAI API 오류 발생: {e}")
-        return {"판단": "판독 불가", "이유": f"OpenAI API 오류: {e}"}
-    except Exception as e:
-        print(f"예상치 못한 오류 발생: {e}")
-        traceback.print_exc()
-        return {"판단": "판독 불가", "이유": f"서버 내부 오류: {e}"}
-
-# --- API 엔드포인트 정의 ---
-@app.post("/analyze")
-async def analyze_image_endpoint(
-    file: UploadFile = File(...),
-    roomId: int = Query(..., description="The ID of the room for classification images"),
-    authorization: str = Header(None, description="Bearer token for authentication with NestJS server")
-):
-    """
-    이미지 파일을 받아 분석하고 정상/비정상 여부와 이유를 JSON으로 반환합니다.
-    """
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header is missing")
-
-    token = authorization.split(" ")[1] if "Bearer" in authorization else authorization
+    return result
 
+# --- 룸 기준 이미지 로드 (캐시 미스 시 NestJS에서 조회) ---
+async def load_room_images(roomId: int, token: str, verify: bool = False) -> tuple[list[str], list[str]]:
+    """verify=True 이면 캐시에 있더라도 NestJS에서 토큰의 룸 접근 권한을 확인합니다."""
     # 캐시 확인
-    if roomId in ROOM_IMAGE_CACHE:
+    if roomId in ROOM_IMAGE_CACHE and not verify:
         print(f"INFO: Cache hit for room {roomId}")
-        cached_images = ROOM_IMAGE_CACHE[roomId]
-        normal_imgs_b64 = cached_images["normal"]
-        abnormal_imgs_b64 = cached_images["abnormal"]
+        normal_imgs_b64, abnormal_imgs_b64 = get_room_images_b64(roomId)
     else:
-        print(f"INFO: Cache miss for room {roomId}. Fetching from NestJS...")
+        print(f"INFO: Fetching room {roomId} from NestJS...")
         # NestJS 서버에서 룸 상세 정보 가져오기
         nestjs_url = os.getenv("NESTJS_URL", "https://topaboki.kr/api") + f"/room/{roomId}"
         try:
@@ -192,10 +159,10 @@ async def analyze_image_endpoint(
                 full_normal_image_paths = [os.path.join(UPLOADS_BASE_PATH, img_url.lstrip('/uploads/')) for img_url in normal_images_urls]
                 full_abnormal_image_paths = [os.path.join(UPLOADS_BASE_PATH, img_url.lstrip('/uploads/')) for img_url in abnormal_images_urls]
 
-                # 이미지 Base64 인코딩 및 캐시에 저장
-                normal_imgs_b64 = [encode_image(path) for path in full_normal_image_paths]
-                abnormal_imgs_b64 = [encode_image(path) for path in full_abnormal_image_paths]
-                ROOM_IMAGE_CACHE[roomId] = {"normal": normal_imgs_b64, "abnormal": abnormal_imgs_b64}
+                # 이미지를 내용 해시 기준으로 공유 캐시에 등록 (다른 룸과 같은 이미지는 다시 인코딩하지 않음)
+                if roomId not in ROOM_IMAGE_CACHE:
+                    cache_room_images(roomId, full_normal_image_paths, full_abnormal_image_paths)
+                normal_imgs_b64, abnormal_imgs_b64 = get_room_images_b64(roomId)
 
         except httpx.HTTPStatusError as e:
             print(f"Error fetching room details from NestJS: {e.response.status_code} - {e.response.text}")
@@ -208,6 +175,25 @@ async def analyze_image_endpoint(
             traceback.print_exc()
             raise HTTPException(status_code=500, detail=f"룸 정보 처리 중 오류 발생: {e}")
 
+    return normal_imgs_b64, abnormal_imgs_b64
+
+# --- API 엔드포인트 정의 ---
+@app.post("/analyze")
+async def analyze_image_endpoint(
+    file: UploadFile = File(...),
+    roomId: int = Query(..., description="The ID of the room for classification images"),
+    authorization: str = Header(None, description="Bearer token for authentication with NestJS server")
+):
+    """
+    이미지 파일을 받아 분석하고 정상/비정상 여부와 이유를 JSON으로 반환합니다.
+    """
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Authorization header is missing")
+
+    token = authorization.split(" ")[1] if "Bearer" in authorization else authorization
+
+    normal_imgs_b64, abnormal_imgs_b64 = await load_room_images(roomId, token)
+
     unique_id = uuid.uuid4()
     temp_file_path = f"temp_{unique_id}_{file.filename}"
 
@@ -216,7 +202,9 @@ async def analyze_image_endpoint(
             shutil.copyfileobj(file.file, buffer)
 
         # 캐시된 Base64 이미지 데이터를 분석 함수에 전달
-        analysis_result = get_analysis_from_openai(
+        # 모델 호출은 블로킹이므로 이벤트 루프(WebSocket 스테이션 포함)를 막지 않도록 스레드에서 실행합니다.
+        analysis_result = await asyncio.to_thread(
+            get_analysis_from_openai,
             temp_file_path,
             normal_imgs_b64,
             abnormal_imgs_b64
@@ -234,6 +222,123 @@ async def analyze_image_endpoint(
         if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
 
+# --- 스테이션용 WebSocket 검사 채널 ---
+# 연결 하나에서 동시에 분석할 최대 프레임 수
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "4"))
+# 연결 하나에서 대기 중인 프레임과 분석 중인 프레임을 합친 최대 수 (초과하면 busy로 거절)
+WS_MAX_QUEUED = int(os.getenv("WS_MAX_QUEUED", str(WS_MAX_INFLIGHT * 2)))
+
+@app.websocket("/ws/analyze")
+async def analyze_websocket_endpoint(websocket: WebSocket):
+    """
+    스테이션이 한 번 인증하고 룸에 바인딩한 뒤, JPEG 프레임을 연속으로 보내 판정을 비동기로 받습니다.
+
+    프로토콜:
+      1. 클라이언트 → {"type": "bind", "token": "...", "roomId": 1}
+         서버 → {"type": "bound", "roomId": 1} (실패 시 {"type": "error", ...} 후 연결 종료)
+      2. 클라이언트 → {"type": "frame", "id": "unit-42"} (선택) 다음에 JPEG 바이너리 메시지
+         id 헤더가 없으면 서버가 순번을 id로 붙입니다.
+      3. 서버 → {"type": "progress", "id": ..., "status": "queued" | "analyzing"}
+         서버 → {"type": "result", "id": ..., "status": "done", "판단": ..., "이유": ...}
+         대기 중인 프레임이 WS_MAX_QUEUED개를 넘으면 서버 → {"type": "error", "id": ..., "status": "busy"}
+
+    기준 이미지는 프레임마다 공유 캐시에서 다시 조회하므로, /clear-cache 후에는 바뀐 기준 이미지로 판정합니다.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    # 1. 인증 및 룸 바인딩
+    try:
+        try:
+            bind = await websocket.receive_json()
+        except (KeyError, json.JSONDecodeError):
+            # 바이너리 메시지이거나 JSON이 아닌 경우
+            bind = None
+        roomId = bind.get("roomId") if isinstance(bind, dict) else None
+        token = bind.get("token") if isinstance(bind, dict) else None
+        if not isinstance(bind, dict) or bind.get("type") != "bind" or not isinstance(roomId, int) or not isinstance(token, str) or not token:
+            await send({"type": "error", "detail": "첫 메시지는 token과 정수 roomId를 포함한 bind 메시지여야 합니다."})
+            await websocket.close(code=1008)
+            return
+        token = token.removeprefix("Bearer ").strip()
+        if not token or token == "Bearer":
+            await send({"type": "error", "detail": "토큰이 비어 있습니다."})
+            await websocket.close(code=1008)
+            return
+        # 캐시에 있는 룸이라도 바인딩할 때는 토큰의 룸 접근 권한을 확인합니다.
+        await load_room_images(roomId, token, verify=True)
+    except HTTPException as e:
+        await send({"type": "error", "detail": e.detail})
+        await websocket.close(code=1008)
+        return
+    except WebSocketDisconnect:
+        return
+
+    await send({"type": "bound", "roomId": roomId})
+    print(f"INFO: Station bound to room {roomId} over WebSocket")
+
+    client = openai.OpenAI(api_key=api_key)
+    inflight = asyncio.Semaphore(WS_MAX_INFLIGHT)
+    tasks = set()
+
+    async def process(frame_id: str, jpeg_bytes: bytes):
+        try:
+            async with inflight:
+                await send({"type": "progress", "id": frame_id, "status": "analyzing"})
+                try:
+                    normal_imgs_b64, abnormal_imgs_b64 = await load_room_images(roomId, token)
+                except HTTPException as e:
+                    await send({"type": "error", "id": frame_id, "detail": e.detail})
+                    return
+                test_img_b64 = base64.b64encode(jpeg_bytes).decode("utf-8")
+                result, _ = await asyncio.to_thread(analyze_image, client, test_img_b64, normal_imgs_b64, abnormal_imgs_b64)
+            await send({"type": "result", "id": frame_id, "status": "done", **result})
+        except (WebSocketDisconnect, RuntimeError):
+            # 분석 중에 스테이션 연결이 끊겼으면 결과를 보낼 곳이 없습니다.
+            pass
+
+    # 2. 프레임 수신 루프
+    seq = 0
+    pending_id = None
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is not None:
+                try:
+                    header = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    header = None
+                if not isinstance(header, dict):
+                    await send({"type": "error", "detail": "잘못된 JSON 메시지입니다."})
+                    continue
+                if header.get("type") == "frame":
+                    pending_id = str(header.get("id", ""))
+                continue
+
+            seq += 1
+            frame_id = pending_id or str(seq)
+            pending_id = None
+            # 모델보다 빨리 보내는 스테이션 때문에 메모리가 계속 늘지 않도록 대기 수를 제한합니다.
+            if len(tasks) >= WS_MAX_QUEUED:
+                await send({"type": "error", "id": frame_id, "status": "busy"})
+                continue
+            await send({"type": "progress", "id": frame_id, "status": "queued"})
+            task = asyncio.create_task(process(frame_id, message["bytes"]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        print(f"INFO: Station for room {roomId} disconnected")
+
 # --- 캐시 무효화 엔드포인트 ---
 @app.post("/clear-cache")
 async def clear_cache_endpoint(
@@ -255,8 +360,7 @@ async def clear_cache_endpoint(
         print(f"Error processing request body: {e}")
         raise HTTPException(status_code=400, detail=f"Error processing request body: {e}")
 
-    if roomId in ROOM_IMAGE_CACHE:
-        del ROOM_IMAGE_CACHE[roomId]
+    if uncache_room_images(roomId):
         print(f"INFO: Cache for room {roomId} cleared successfully.")
     else:
         print(f"INFO: Cache for room {roomId} not found, no action needed.")
@@ -287,7 +391,8 @@ If the text does not contain a sequence of instructions, then simply write "제
 """
     try:
         client = openai.OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
+        response = DESCRIPTION_CALLER.create(
+            client,
             model="gpt-4.1-mini",
             messages=[
                 {"role": "system", "content": 장애맞춤설명문_prompt},
@@ -296,6 +401,12 @@ If the text does not contain a sequence of instructions, then simply write "제
             temperature=0.5
         )
         return response.choices[0].message.content.strip()
+    except CircuitOpenError as e:
+        print(f"서킷 브레이커 차단 중: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except (ModelDeadlineExceeded, openai.APITimeoutError) as e:
+        print(f"OpenAI API 응답 시간 초과: {e}")
+        raise HTTPException(status_code=504, detail=f"AI 모델 응답 시간 초과: {e}")
     except openai.APIError as e:
         print(f"OpenAI API 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=f"OpenAI API 오류: {e}")
@@ -0,0 +1,327 @@
+import base64
+import json
+import math
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai
+
+# --- 결선 검사 시스템 프롬프트 ---
+SYSTEM_PROMPT = (
+    "당신은 스위치 전선 결선 상태를 비교하여 판단하는 정밀 시각 AI입니다.\n\n"
+    "정상 여부의 판단 기준은 아래와 같습니다:\n"
+    "1. 전선의 색상, 위치, 개수, 방향이 기준 이미지와 대체로 동일해야 합니다.\n"
+    "2. 전체 결선 구조가 유사하고 연결 실수가 없으면 '정상'으로 판단하십시오.\n"
+    "3. 눈에 띄는 차이, 빠진 선, 다른 위치의 결선이 있으면 '비정상'입니다.\n\n"
+    "4. 문제가 생기거나 분석할 수 없으면 반드시 아래를 출력하세요.:\n"
+    '{\"판단\": \"판독 불가\",\n'
+    '\"이유\": \"이미지를 분석할 수 없습니다.\"\n}'
+    "5. 출력은 반드시 아래 형식에 맞춰주세요. 다른 말은 절대 하지 마세요:\n"
+    '{\"판단\": \"정상 or 비정상\",\n'
+    '\"이유\": \"만약 비정상이라면, 어떤 점이 다른지 단순하고 명확하게 설명하세요. 비정상이라면 예시 이미지를 언급하지 말고, 정상이라면 `해당 없음`으로 표기하세요.\"\n}'
+)
+
+MODEL = "gpt-4o"
+
+# --- 모델 호출 지연/장애 대응 설정 ---
+ANALYSIS_TIMEOUT = float(os.getenv("OPENAI_ANALYSIS_TIMEOUT", "20"))        # 분석 호출 1건의 최대 대기 시간(초)
+DESCRIPTION_TIMEOUT = float(os.getenv("OPENAI_DESCRIPTION_TIMEOUT", "30"))  # 설명문 생성 호출의 최대 대기 시간(초)
+HEDGE_ENABLED = os.getenv("OPENAI_HEDGE", "0") == "1"        # p95 지연을 넘기면 같은 요청을 한 번 더 보냄
+HEDGE_BUDGET = float(os.getenv("OPENAI_HEDGE_BUDGET", "0.1"))  # 전체 호출 중 중복 요청을 보낼 수 있는 최대 비율 (추가 비용 상한)
+CALL_WORKERS = int(os.getenv("OPENAI_CALL_WORKERS", "32"))     # 모델 호출을 동시에 실행할 최대 스레드 수
+BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))      # 연속 실패가 이만큼 쌓이면 차단
+BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "30"))  # 차단 후 다시 시도하기까지의 시간(초)
+
+# 중복 요청을 포함한 모델 호출을 실행하는 공용 스레드 풀
+_CALL_EXECUTOR = ThreadPoolExecutor(max_workers=CALL_WORKERS, thread_name_prefix="openai-call")
+_busy_workers = 0  # 지금 요청을 보내고 있는 스레드 수
+_busy_lock = threading.Lock()
+
+
+class ModelDeadlineExceeded(TimeoutError):
+    """모델 호출이 제한 시간 안에 끝나지 않았습니다."""
+
+
+class CircuitOpenError(RuntimeError):
+    """최근 모델 호출이 연속으로 실패해 요청을 보내지 않고 바로 실패 처리합니다."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"AI 모델 응답이 불안정하여 검사를 잠시 중단했습니다. {math.ceil(retry_after)}초 후 다시 시도합니다.")
+        self.retry_after = retry_after
+
+
+class LatencyTracker:
+    """최근 성공한 호출의 지연 시간으로 p95를 계산합니다."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def p95(self) -> float | None:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class CircuitBreaker:
+    """연속 실패가 threshold 번 쌓이면 cooldown 동안 호출을 막고, 이후 한 건만 시험 삼아 통과시킵니다."""
+
+    def __init__(self, threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpenError(max(remaining, 0))
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release_trial(self):
+        """시험 호출이 업스트림에 도달하지 못했을 때, 상태는 그대로 두고 다음 시험 호출을 허용합니다."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+def _is_upstream_failure(e: Exception) -> bool:
+    """잘못된 요청(4xx)이 아니라 업스트림 장애로 볼 수 있는 오류인지 확인합니다."""
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code >= 500 or e.status_code == 429
+    return isinstance(e, (openai.APIConnectionError, ModelDeadlineExceeded))
+
+
+class ModelCaller:
+    """
+    chat.completions.create 호출에 제한 시간, 지연 헤징, 서킷 브레이커를 적용합니다.
+
+    헤징을 켜면 호출이 최근 p95 지연을 넘길 때 같은 요청을 한 번 더 보내고 먼저 끝난 응답을 사용합니다.
+    이미 전송된 요청은 중간에 끊을 수 없으므로 늦은 쪽의 결과는 버리며, 그 비용은 HEDGE_BUDGET으로 제한합니다.
+    제한 시간과 헤징 대기 시간은 스레드 풀에서 요청이 실제로 시작된 시점부터 계산하므로,
+    풀이 붐벼서 기다린 시간 때문에 헤징이 나가거나 시간 초과로 차단되지 않습니다.
+    대신 풀의 대기열에서도 최대 timeout까지만 기다리므로, 전체 대기 시간은 timeout의 두 배를 넘지 않습니다.
+    """
+
+    def __init__(self, timeout: float, hedge: bool = False, hedge_budget: float = HEDGE_BUDGET,
+                 breaker: CircuitBreaker | None = None):
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_budget = hedge_budget
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyTracker()
+        self._calls = 0   # 지금까지의 호출 수
+        self._hedges = 0  # 그중 중복 요청을 보낸 수
+        self._lock = threading.Lock()
+
+    def _try_hedge(self) -> bool:
+        # 남는 스레드가 없으면 중복 요청도 대기열에서 기다리기만 하므로 보내지 않습니다.
+        with _busy_lock:
+            if _busy_workers >= CALL_WORKERS:
+                return False
+        with self._lock:
+            if self._hedges + 1 > self.hedge_budget * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+    @staticmethod
+    def _run_create(client: openai.OpenAI, kwargs: dict, started: threading.Event | None = None):
+        global _busy_workers
+        with _busy_lock:
+            _busy_workers += 1
+        if started is not None:
+            started.set()
+        try:
+            return client.chat.completions.create(**kwargs)
+        finally:
+            with _busy_lock:
+                _busy_workers -= 1
+
+    def create(self, client: openai.OpenAI, **kwargs):
+        self.breaker.before_call()
+        # 재시도는 헤징과 제한 시간으로 대신합니다.
+        client = client.with_options(timeout=self.timeout, max_retries=0)
+        with self._lock:
+            self._calls += 1
+
+        started = threading.Event()
+        pending = {_CALL_EXECUTOR.submit(self._run_create, client, kwargs, started)}
+        # 풀의 대기열에서 기다린 시간은 제한 시간과 헤징 대기 시간에 넣지 않되, 대기 자체도 timeout으로 제한합니다.
+        if not started.wait(self.timeout):
+            next(iter(pending)).cancel()
+            # 업스트림 장애가 아니라 이 서버가 붐빈 것이므로 서킷 브레이커에는 실패로 세지 않습니다.
+            self.breaker.release_trial()
+            raise ModelDeadlineExceeded(f"모델 호출 대기열에서 {self.timeout:g}초 동안 시작하지 못했습니다.")
+        call_start = time.monotonic()
+        deadline = call_start + self.timeout
+
+        hedge_delay = self.latencies.p95() if self.hedge else None
+        if hedge_delay is not None and hedge_delay < self.timeout:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done and self._try_hedge():
+                pending.add(_CALL_EXECUTOR.submit(self._run_create, client, kwargs))
+
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                # 먼저 끝난 응답을 사용하고, 남은 요청은 시작 전이면 취소하고 진행 중이면 결과를 버립니다.
+                for other in pending:
+                    other.cancel()
+                # 중복 요청이 이겼더라도 원래 호출이 시작된 시점부터의 지연을 기록합니다.
+                self.latencies.add(time.monotonic() - call_start)
+                self.breaker.record_success()
+                return response
+
+        for future in pending:
+            future.cancel()
+        if pending or error is None:
+            error = ModelDeadlineExceeded(f"모델 응답이 {self.timeout:g}초 안에 도착하지 않았습니다.")
+        if _is_upstream_failure(error):
+            self.breaker.record_failure()
+        else:
+            # 업스트림은 응답했으므로 장애로 세지 않습니다.
+            self.breaker.record_success()
+        raise error
+
+
+ANALYSIS_CALLER = ModelCaller(ANALYSIS_TIMEOUT, hedge=HEDGE_ENABLED)
+DESCRIPTION_CALLER = ModelCaller(DESCRIPTION_TIMEOUT)
+
+
+# --- 이미지 Base64 인코딩 함수 ---
+def encode_image(path: str) -> str:
+    with open(path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+# --- OpenAI API에 전달할 메시지 구성 ---
+def build_messages(test_img_b64: str, normal_imgs_b64: list[str], abnormal_imgs_b64: list[str]) -> list[dict]:
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "이 이미지는 정상적으로 결선된 스위치입니다."},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpg;base64,{normal_imgs_b64[0]}"}}
+            ]
+        }
+    ]
+
+    for idx, b64_img in enumerate(abnormal_imgs_b64):
+        messages.append({
+            "role": "user",
+            "content": [
+                {"type": "text", "text": f"이 이미지는 비정상 스위치 예시 {idx+1}입니다."},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpg;base64,{b64_img}"}}
+            ]
+        })
+
+    messages.append({
+        "role": "user",
+        "content": [
+            {"type": "text", "text": "이 이미지를 판단해서 위의 양식에 맞춰 답하세요'"},
+            {"type": "image_url", "image_url": {"url": f"data:image/jpg;base64,{test_img_b64}"}}
+        ]
+    })
+    return messages
+
+
+# --- 핵심 분석 로직 함수 ---
+def analyze_image(client: openai.OpenAI, test_img_b64: str, normal_imgs_b64: list[str], abnormal_imgs_b64: list[str],
+                  caller: ModelCaller = ANALYSIS_CALLER) -> tuple[dict, dict | None]:
+    """
+    테스트 이미지를 기준 이미지와 비교해 판정합니다.
+    ({"판단": ..., "이유": ...}, 토큰 사용량) 을 반환하며, 오류가 나면 '판독 불가'로 판정합니다.
+    모델의 답이 아니라 시간 초과, API 오류, 서킷 브레이커 차단 때문에 판독하지 못했다면
+    결과에 "error" 필드(timeout / circuit_open / api_error / internal)를 추가하므로, 호출한 쪽에서 재시도할 수 있습니다.
+    """
+    messages = build_messages(test_img_b64, normal_imgs_b64, abnormal_imgs_b64)
+
+    try:
+        response = caller.create(
+            client,
+            model=MODEL,
+            messages=messages,
+            temperature=0,
+            max_tokens=200,
+        )
+
+        usage = None
+        if getattr(response, "usage", None) is not None:
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens,
+            }
+
+        response_content = response.choices[0].message.content if response.choices and response.choices[0].message else None
+
+        if response_content is None:
+            print(f"OpenAI API 응답 content가 None입니다. 전체 응답: {response}")
+            return {"판단": "판독 불가", "이유": "OpenAI API 응답에서 유효한 content를 받지 못했습니다."}, usage
+
+        try:
+            response_data = json.loads(response_content)
+        except json.JSONDecodeError as e:
+            print(f"JSON 파싱 오류: {e}\n응답 내용: {response_content}")
+            return {"판단": "판독 불가", "이유": f"{response_content[:200]}"}, usage
+        except Exception as e:
+            print(f"예상치 못한 파싱 오류: {e}\n응답 내용: {response_content}")
+            traceback.print_exc()
+            return {"판단": "판독 불가", "이유": f"예상치 못한 파싱 오류: {e}"}, usage
+
+        judgment = response_data.get("판단", "오류")
+        reason = response_data.get("이유", "이유를 파악할 수 없음")
+        return {"판단": judgment, "이유": reason}, usage
+
+    except CircuitOpenError as e:
+        print(f"서킷 브레이커 차단 중: {e}")
+        return {"판단": "판독 불가", "이유": str(e), "error": "circuit_open"}, None
+    except (ModelDeadlineExceeded, openai.APITimeoutError) as e:
+        print(f"OpenAI API 응답 시간 초과: {e}")
+        return {"판단": "판독 불가", "이유": f"AI 모델 응답 시간 초과: {e}", "error": "timeout"}, None
+    except openai.APIError as e:
+        print(f"OpenAI API 오류 발생: {e}")
+        return {"판단": "판독 불가", "이유": f"OpenAI API 오류: {e}", "error": "api_error"}, None
+    except Exception as e:
+        print(f"예상치 못한 오류 발생: {e}")
+        traceback.print_exc()
+        return {"판단": "판독 불가", "이유": f"서버 내부 오류: {e}", "error": "internal"}, None
@@ -0,0 +1,250 @@
+"""
+생산품 일괄 검수 CLI
+
+기준 이미지(정상/비정상)와 테스트 이미지 디렉터리(또는 glob)를 받아 병렬로 판정하고,
+이미지별 판정/지연 시간/토큰 사용량을 CSV 또는 JSONL로 기록합니다.
+중단 후 다시 실행하면 결과 파일에 같은 기준 이미지로 이미 판정된 이미지는 건너뛰고,
+시간 초과/API 오류/파일 읽기 실패처럼 모델이 판정하지 못한 이미지(error 열)는 다시 검사합니다.
+기준 이미지가 바뀌면(reference 열) 이전 판정은 재사용하지 않습니다.
+파일 이름에 `(정상)` / `(비정상)` 이 들어 있으면 정답 라벨로 사용해 정확도를 보고합니다.
+
+예시:
+    python 일괄검수.py "image/테스트이미지*.jpg" -o results.csv
+    python 일괄검수.py tests/ --normal ref/ok.jpg --abnormal ref/ng1.jpg ref/ng2.jpg -j 8
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+from dotenv import load_dotenv
+
+# .env 파일에서 환경 변수 로드 (inspection 모듈이 import 시점에 OPENAI_* 설정을 읽으므로 먼저 실행)
+load_dotenv()
+
+from inspection import analyze_image, encode_image
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(SCRIPT_DIR, "image")
+
+# --- 기본 기준 이미지 경로 ---
+DEFAULT_NORMAL = [os.path.join(IMAGE_DIR, "정상이미지.jpg")]
+DEFAULT_ABNORMAL = [os.path.join(IMAGE_DIR, f"비정상이미지{i}.jpg") for i in range(1, 4)]
+DEFAULT_TESTS = [os.path.join(IMAGE_DIR, "테스트이미지*.jpg")]
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+LABEL_PATTERN = re.compile(r"\((정상|비정상)\)")
+
+FIELDS = ["image", "reference", "label", "판단", "이유", "error", "correct", "latency_s", "prompt_tokens", "completion_tokens", "total_tokens"]
+
+
+# --- 테스트 이미지 수집 ---
+def collect_images(targets: list[str]) -> list[str]:
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            matches = [os.path.join(target, name) for name in os.listdir(target)]
+        else:
+            matches = glob.glob(target)
+        paths.extend(p for p in matches if p.lower().endswith(IMAGE_EXTENSIONS))
+    # 중복 제거 후 정렬
+    return sorted(set(os.path.abspath(p) for p in paths))
+
+
+def label_from_filename(path: str) -> str | None:
+    match = LABEL_PATTERN.search(os.path.basename(path))
+    return match.group(1) if match else None
+
+
+# --- 결과 파일 읽기/쓰기 (이어하기 지원) ---
+def reference_fingerprint(normal_imgs_b64: list[str], abnormal_imgs_b64: list[str]) -> str:
+    """기준 이미지 구성(내용과 정상/비정상 구분)을 식별하는 짧은 해시입니다."""
+    digest = hashlib.sha256()
+    for role, images in (("normal", normal_imgs_b64), ("abnormal", abnormal_imgs_b64)):
+        for b64_img in images:
+            digest.update(f"{role}:{hashlib.sha256(b64_img.encode()).hexdigest()}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_done(output_path: str, reference: str) -> dict[str, dict]:
+    """결과 파일에서 같은 기준 이미지로 모델이 실제로 판정한 이미지만 {image: 마지막 결과} 로 반환합니다."""
+    if not os.path.exists(output_path):
+        return {}
+    rows = []
+    with open(output_path, encoding="utf-8", newline="") as f:
+        if output_path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 기록 중에 중단되어 잘린 줄은 무시하고 다시 검사합니다.
+                    print(f"경고: 결과 파일의 손상된 줄을 무시합니다: {line[:80]!r}", file=sys.stderr)
+    # 같은 이미지가 여러 번 기록되어 있으면 마지막 결과를 사용합니다.
+    latest = {row["image"]: row for row in rows if isinstance(row, dict) and row.get("image")}
+    return {
+        image: row for image, row in latest.items()
+        if not row.get("error") and row.get("reference") == reference
+    }
+
+
+class ResultWriter:
+    """여러 스레드에서 한 줄씩 안전하게 결과를 추가합니다."""
+
+    def __init__(self, output_path: str):
+        self.is_csv = output_path.endswith(".csv")
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        # 이전 실행이 줄 중간에 중단되었다면 새 결과가 잘린 줄에 이어 붙지 않도록 줄을 바꿉니다.
+        needs_newline = False
+        if not is_new:
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) not in (b"\n", b"\r")
+        self._file = open(output_path, "a", encoding="utf-8", newline="")
+        if needs_newline:
+            self._file.write("\n")
+        self._lock = threading.Lock()
+        if self.is_csv:
+            self._csv = csv.DictWriter(self._file, fieldnames=FIELDS)
+            if is_new:
+                self._csv.writeheader()
+
+    def write(self, row: dict):
+        with self._lock:
+            if self.is_csv:
+                self._csv.writerow(row)
+            else:
+                self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            # 중단되어도 이미 끝난 결과는 남도록 매번 flush
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# --- 이미지 한 장 검사 ---
+def inspect_one(client: openai.OpenAI, path: str, normal_imgs_b64: list[str], abnormal_imgs_b64: list[str], reference: str) -> dict:
+    label = label_from_filename(path)
+    start = time.perf_counter()
+    try:
+        result, usage = analyze_image(client, encode_image(path), normal_imgs_b64, abnormal_imgs_b64)
+    except OSError as e:
+        result, usage = {"판단": "판독 불가", "이유": f"이미지 파일을 읽을 수 없습니다: {e}", "error": "read_error"}, None
+    latency = time.perf_counter() - start
+    usage = usage or {}
+    error = result.get("error", "")
+    return {
+        "image": path,
+        "reference": reference,
+        "label": label or "",
+        "판단": result["판단"],
+        "이유": result["이유"],
+        "error": error,
+        # 판정하지 못한 이미지는 정확도 계산에서 제외합니다.
+        "correct": "" if label is None or error else result["판단"] == label,
+        "latency_s": round(latency, 3),
+        "prompt_tokens": usage.get("prompt_tokens", ""),
+        "completion_tokens": usage.get("completion_tokens", ""),
+        "total_tokens": usage.get("total_tokens", ""),
+    }
+
+
+# --- 요약 출력 ---
+def print_summary(rows: list[dict]):
+    failed = [r for r in rows if r.get("error")]
+    labeled = [r for r in rows if r.get("label") and not r.get("error")]
+    total_tokens = sum(int(r["total_tokens"]) for r in rows if str(r.get("total_tokens", "")).isdigit())
+    latencies = sorted(float(r["latency_s"]) for r in rows if r.get("latency_s") not in (None, ""))
+
+    print("\n" + "-" * 20)
+    print(f" 검사 이미지: {len(rows)}장")
+    if latencies:
+        print(f" 평균 지연 시간: {sum(latencies) / len(latencies):.2f}s (최대 {latencies[-1]:.2f}s)")
+    print(f" 총 토큰 사용량: {total_tokens}")
+    if failed:
+        print(f" 판정 실패: {len(failed)}장 (다시 실행하면 재시도합니다)")
+    if labeled:
+        correct = sum(1 for r in labeled if str(r["correct"]) == "True")
+        print(f" 정확도: {correct}/{len(labeled)} ({correct / len(labeled):.1%})")
+    print("-" * 20)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="기준 이미지와 비교하여 테스트 이미지들을 병렬로 검수합니다.")
+    parser.add_argument("tests", nargs="*", default=DEFAULT_TESTS, help="테스트 이미지 디렉터리 또는 glob 패턴")
+    parser.add_argument("--normal", nargs="+", default=DEFAULT_NORMAL, help="정상 기준 이미지 경로")
+    parser.add_argument("--abnormal", nargs="+", default=DEFAULT_ABNORMAL, help="비정상 기준 이미지 경로")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="결과 파일 (.csv 또는 .jsonl)")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="동시에 처리할 최대 이미지 수")
+    parser.add_argument("--no-resume", action="store_true", help="기존 결과 파일을 무시하고 처음부터 다시 검사")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("오류: OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.", file=sys.stderr)
+        return 1
+
+    try:
+        normal_imgs_b64 = [encode_image(path) for path in args.normal]
+        abnormal_imgs_b64 = [encode_image(path) for path in args.abnormal]
+    except FileNotFoundError as e:
+        print(f"오류: {e.filename} 파일을 찾을 수 없습니다.", file=sys.stderr)
+        return 1
+
+    images = collect_images(args.tests)
+    if not images:
+        print("오류: 검사할 테스트 이미지가 없습니다.", file=sys.stderr)
+        return 1
+
+    if args.no_resume and os.path.exists(args.output):
+        os.remove(args.output)
+    reference = reference_fingerprint(normal_imgs_b64, abnormal_imgs_b64)
+    done = load_done(args.output, reference)
+    pending = [path for path in images if path not in done]
+    if done:
+        print(f"이전 실행에서 판정된 {len(done)}장을 건너뜁니다.")
+
+    client = openai.OpenAI(api_key=api_key)
+    writer = ResultWriter(args.output)
+    rows = [done[path] for path in images if path in done]
+    executor = ThreadPoolExecutor(max_workers=max(1, args.workers))
+    try:
+        futures = {
+            executor.submit(inspect_one, client, path, normal_imgs_b64, abnormal_imgs_b64, reference): path
+            for path in pending
+        }
+        for count, future in enumerate(as_completed(futures), start=1):
+            row = future.result()
+            writer.write(row)
+            rows.append(row)
+            if row["error"]:
+                mark = f" (판정 실패: {row['error']})"
+            else:
+                mark = "" if row["correct"] == "" else (" O" if row["correct"] else " X")
+            print(f"[{count}/{len(pending)}] {os.path.basename(row['image'])}: {row['판단']} ({row['latency_s']:.2f}s){mark}")
+    except KeyboardInterrupt:
+        print("\n중단되었습니다. 다시 실행하면 이어서 검사합니다.")
+        # 진행 중인 요청은 끝나는 대로 버리고, 대기 중인 요청은 취소합니다.
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 130
+    finally:
+        executor.shutdown(wait=False)
+        writer.close()
+
+    print_summary(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
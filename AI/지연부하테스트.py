@@ -0,0 +1,95 @@
+"""
+모델 호출 지연 부하 테스트 (OpenAI 호출 없음)
+
+꼬리 지연이 긴 가짜 OpenAI 클라이언트로 analyze_image를 동시에 호출하여,
+헤징을 끄고 켰을 때의 p50/p95/p99 지연과 실제로 보낸 요청 수(비용)를 비교합니다.
+
+예시:
+    python 지연부하테스트.py -n 400 -j 8
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from inspection import CircuitBreaker, ModelCaller, analyze_image
+
+FAKE_CONTENT = '{"판단": "정상", "이유": "해당 없음"}'
+
+
+class FakeClient:
+    """대부분 빠르게 응답하지만 일부 호출이 매우 느린 OpenAI 클라이언트 흉내."""
+
+    def __init__(self, base: float, slow: float, slow_ratio: float, seed: int):
+        self.base = base
+        self.slow = slow
+        self.slow_ratio = slow_ratio
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, **_):
+        return self
+
+    def _create(self, **_):
+        with self._lock:
+            self.requests += 1
+            slow = self._rng.random() < self.slow_ratio
+            jitter = self._rng.uniform(0.8, 1.2)
+        time.sleep((self.slow if slow else self.base) * jitter)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=FAKE_CONTENT))],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=20, total_tokens=1020),
+        )
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run(hedge: bool, args) -> dict:
+    client = FakeClient(args.base, args.slow, args.slow_ratio, args.seed)
+    caller = ModelCaller(args.timeout, hedge=hedge, hedge_budget=args.budget,
+                         breaker=CircuitBreaker(threshold=10**9))
+    latencies = []
+
+    def one(_):
+        start = time.monotonic()
+        analyze_image(client, "", [""], [""], caller=caller)
+        latencies.append(time.monotonic() - start)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(one, range(args.requests)))
+
+    ordered = sorted(latencies)
+    return {
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "cost": client.requests / args.requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 OpenAI 클라이언트로 헤징 전후 꼬리 지연을 비교합니다.")
+    parser.add_argument("-n", "--requests", type=int, default=400)
+    parser.add_argument("-j", "--workers", type=int, default=8)
+    parser.add_argument("--base", type=float, default=0.05, help="일반 응답 시간(초)")
+    parser.add_argument("--slow", type=float, default=1.0, help="느린 응답 시간(초)")
+    parser.add_argument("--slow-ratio", type=float, default=0.03, help="느린 응답 비율")
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--budget", type=float, default=0.1, help="헤징 비용 상한 (요청 대비 비율)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for hedge in (False, True):
+        r = run(hedge, args)
+        label = "헤징 켬 " if hedge else "헤징 끔 "
+        print(f"{label}: p50 {r['p50']:.3f}s  p95 {r['p95']:.3f}s  p99 {r['p99']:.3f}s  요청당 호출 {r['cost']:.3f}회")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import logging
+import time
+
+import cv2
+import numpy as np
+
+# --- 캡처 백엔드 ---
+# 모든 백엔드는 read()로 (JPEG 바이트, 디코딩된 BGR 프레임 또는 None)을 반환합니다.
+# 프레임이 None이면 픽셀이 필요한 쪽에서 decode_for_motion()으로 직접 디코딩합니다.
+# 손상된 프레임은 백엔드 안에서 건너뛰고, JPEG 바이트가 None이면 카메라를 더 이상 쓸 수 없다는 뜻입니다.
+
+JPEG_QUALITY = 80
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+MAX_BAD_FRAMES = 30  # 손상된 프레임이 이만큼 연속되면 카메라를 쓸 수 없다고 판단
+
+
+def decode_for_motion(jpeg_bytes: bytes):
+    """움직임 감지용으로 JPEG를 1/4 크기 흑백으로만 디코딩합니다 (전체 디코딩보다 훨씬 가볍습니다)."""
+    return cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+
+
+class OpenCVCapture:
+    """기존 방식: 카메라 프레임을 BGR로 디코딩한 뒤 JPEG로 다시 인코딩합니다."""
+
+    name = "opencv"
+
+    def __init__(self, index=0, quality=JPEG_QUALITY):
+        self.index = index
+        self.quality = quality
+        self.cap = None
+
+    def open(self) -> bool:
+        self.cap = cv2.VideoCapture(self.index)
+        return self.cap.isOpened()
+
+    def read(self):
+        for _ in range(MAX_BAD_FRAMES):
+            success, frame = self.cap.read()
+            if not success:
+                return None, None
+            try:
+                ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+            except cv2.error:
+                # 빈 프레임 등 손상된 프레임은 예외가 날 수 있습니다.
+                ret = False
+            if ret:
+                return buffer.tobytes(), frame
+            logging.warning("프레임 인코딩에 실패했습니다. 이 프레임은 건너뜁니다.")
+        logging.error(f"프레임 인코딩이 {MAX_BAD_FRAMES}번 연속 실패했습니다.")
+        return None, None
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class MjpegCapture:
+    """V4L2로 카메라에 MJPEG 출력을 요청하고, 압축된 프레임을 디코딩 없이 그대로 전달합니다."""
+
+    name = "mjpeg"
+
+    def __init__(self, index=0):
+        self.index = index
+        self.cap = None
+        self._first = None
+
+    def open(self) -> bool:
+        self.cap = cv2.VideoCapture(self.index, cv2.CAP_V4L2)
+        if not self.cap.isOpened():
+            return False
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        # RGB 변환을 끄면 read()가 디코딩하지 않은 원본 버퍼를 반환합니다.
+        self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+        # 카메라가 MJPEG를 지원하지 않으면 원본 버퍼가 JPEG가 아니므로 첫 프레임으로 확인합니다.
+        jpeg_bytes, _ = self._read_raw()
+        if jpeg_bytes is None:
+            logging.warning("카메라가 MJPEG 출력을 지원하지 않습니다.")
+            self.release()
+            return False
+        self._first = jpeg_bytes
+        return True
+
+    def _read_raw(self):
+        for _ in range(MAX_BAD_FRAMES):
+            success, buffer = self.cap.read()
+            if not success or buffer is None:
+                return None, None
+            data = buffer.tobytes()
+            if data.startswith(JPEG_SOI):
+                return data, None
+            logging.debug("JPEG가 아닌 버퍼를 받았습니다. 이 프레임은 건너뜁니다.")
+        logging.warning(f"JPEG가 아닌 버퍼를 {MAX_BAD_FRAMES}번 연속 받았습니다.")
+        return None, None
+
+    def read(self):
+        if self._first is not None:
+            jpeg_bytes, self._first = self._first, None
+            return jpeg_bytes, None
+        return self._read_raw()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class MjpegFileCapture:
+    """
+    녹화된 MJPEG 파일(JPEG 프레임을 이어 붙인 파일)을 카메라처럼 재생합니다.
+    카메라 없이 스트리밍, 자동 촬영, 벤치마크를 확인할 때 사용합니다. fps가 0이면 속도를 제한하지 않습니다.
+    """
+
+    name = "file"
+
+    def __init__(self, path, fps=30, loop=True):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.frames = []
+        self._pos = 0
+        self._next_at = 0.0
+
+    def open(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            logging.error(f"MJPEG 파일을 열 수 없습니다: {e}")
+            return False
+
+        # JPEG 시작 마커(SOI) 위치를 기준으로 프레임을 나눕니다.
+        starts = []
+        pos = data.find(JPEG_SOI)
+        while pos != -1:
+            starts.append(pos)
+            end = data.find(JPEG_EOI, pos)
+            if end == -1:
+                break
+            pos = data.find(JPEG_SOI, end + 2)
+        self.frames = [data[s:e] for s, e in zip(starts, starts[1:] + [len(data)])]
+        self._pos = 0
+        self._next_at = time.monotonic()
+        return bool(self.frames)
+
+    def read(self):
+        if self._pos >= len(self.frames):
+            if not self.loop:
+                return None, None
+            self._pos = 0
+        if self.fps > 0:
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_at = max(self._next_at, time.monotonic() - 1) + 1 / self.fps
+        jpeg_bytes = self.frames[self._pos]
+        self._pos += 1
+        return jpeg_bytes, None
+
+    def release(self):
+        self.frames = []
+
+
+def open_capture(index=0, source=None, backend="mjpeg"):
+    """설정에 맞는 캡처 백엔드를 열어 반환합니다. MJPEG를 쓸 수 없으면 기존 OpenCV 방식으로 대체합니다."""
+    if source:
+        candidates = [MjpegFileCapture(source)]
+    elif backend == "mjpeg":
+        candidates = [MjpegCapture(index), OpenCVCapture(index)]
+    else:
+        candidates = [OpenCVCapture(index)]
+
+    for capture in candidates:
+        if capture.open():
+            logging.info(f"캡처 백엔드: {capture.name}")
+            return capture
+        capture.release()
+    return None
@@ -0,0 +1,72 @@
+import argparse
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from capture import JPEG_QUALITY, MjpegCapture, MjpegFileCapture, OpenCVCapture, decode_for_motion
+
+# --- 로깅 설정 ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TranscodingFileCapture(MjpegFileCapture):
+    """녹화 파일로 기존 경로(전체 디코딩 후 JPEG 재인코딩)를 재현합니다."""
+
+    name = "file+transcode"
+
+    def read(self):
+        jpeg_bytes, _ = super().read()
+        if jpeg_bytes is None:
+            return None, None
+        frame = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
+        ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+        return (buffer.tobytes(), frame) if ret else (None, None)
+
+
+def measure(capture, seconds: float, motion: bool) -> dict | None:
+    """capture를 seconds 동안 읽어 FPS와 프로세스 CPU 사용률을 측정합니다."""
+    if not capture.open():
+        logging.error(f"{capture.name} 백엔드를 열 수 없습니다.")
+        return None
+    frames = 0
+    wall_start, cpu_start = time.monotonic(), time.process_time()
+    try:
+        while time.monotonic() - wall_start < seconds:
+            jpeg_bytes, frame = capture.read()
+            if jpeg_bytes is None:
+                break
+            # 자동 촬영 모드처럼 움직임 감지에 필요한 픽셀을 준비합니다.
+            if motion and frame is None:
+                decode_for_motion(jpeg_bytes)
+            frames += 1
+    finally:
+        capture.release()
+    wall = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+    return {"fps": frames / wall, "cpu": 100 * cpu / wall, "cpu_ms_per_frame": 1000 * cpu / max(frames, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="기존 디코딩/재인코딩 경로와 MJPEG 패스스루 경로의 CPU/FPS를 비교합니다.")
+    parser.add_argument("--source", help="카메라 대신 사용할 녹화된 MJPEG 파일")
+    parser.add_argument("--index", type=int, default=0, help="카메라 번호")
+    parser.add_argument("--seconds", type=float, default=10, help="백엔드별 측정 시간(초)")
+    parser.add_argument("--motion", action="store_true", help="자동 촬영 모드처럼 움직임 감지용 디코딩 포함")
+    args = parser.parse_args()
+
+    if args.source:
+        # 파일은 속도 제한 없이 읽어 프레임당 CPU 비용을 비교합니다.
+        captures = [TranscodingFileCapture(args.source, fps=0), MjpegFileCapture(args.source, fps=0)]
+    else:
+        captures = [OpenCVCapture(args.index), MjpegCapture(args.index)]
+
+    for capture in captures:
+        result = measure(capture, args.seconds, args.motion)
+        if result is not None:
+            print(f"{capture.name:>15}: {result['fps']:7.1f} fps  CPU {result['cpu']:5.1f}%  ({result['cpu_ms_per_frame']:.2f} ms/frame)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+
+from capture import MAX_BAD_FRAMES, MjpegCapture, MjpegFileCapture, decode_for_motion
+from test_motion_trigger import place_and_remove, scene, still
+from webcam_example import MotionTrigger
+
+
+def encode(frame) -> bytes:
+    ret, buffer = cv2.imencode('.jpg', frame)
+    assert ret
+    return buffer.tobytes()
+
+
+def write_mjpeg(path, frames):
+    """JPEG 프레임을 이어 붙여 카메라 녹화 파일과 같은 형식의 MJPEG 파일을 만듭니다."""
+    jpegs = [encode(frame) for frame in frames]
+    path.write_bytes(b"".join(jpegs))
+    return jpegs
+
+
+def read_all(capture):
+    frames = []
+    while True:
+        jpeg_bytes, frame = capture.read()
+        if jpeg_bytes is None:
+            return frames
+        assert frame is None
+        frames.append(jpeg_bytes)
+
+
+class FakeCap:
+    """CONVERT_RGB를 끈 cv2.VideoCapture처럼 원본 버퍼를 차례로 돌려줍니다."""
+
+    def __init__(self, buffers):
+        self.buffers = list(buffers)
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        if not self.buffers:
+            return False, None
+        return True, np.frombuffer(self.buffers.pop(0), np.uint8)
+
+    def release(self):
+        pass
+
+
+def test_file_capture_splits_frames_and_stops_at_end_without_loop(tmp_path):
+    path = tmp_path / "recording.mjpeg"
+    jpegs = write_mjpeg(path, [scene(part=False), scene(), scene(hand=(0, 0, 100, 100))])
+
+    capture = MjpegFileCapture(str(path), fps=0, loop=False)
+    assert capture.open()
+    assert read_all(capture) == jpegs
+    # 파일 끝에 도달한 뒤에도 계속 끝을 알립니다.
+    assert capture.read() == (None, None)
+
+
+def test_file_capture_loops_when_enabled(tmp_path):
+    path = tmp_path / "recording.mjpeg"
+    jpegs = write_mjpeg(path, [scene(part=False), scene()])
+
+    capture = MjpegFileCapture(str(path), fps=0)
+    assert capture.open()
+    assert [capture.read()[0] for _ in range(5)] == jpegs * 2 + jpegs[:1]
+
+
+def test_file_capture_rejects_missing_or_empty_file(tmp_path):
+    assert not MjpegFileCapture(str(tmp_path / "missing.mjpeg")).open()
+    empty = tmp_path / "empty.mjpeg"
+    empty.write_bytes(b"")
+    assert not MjpegFileCapture(str(empty)).open()
+
+
+def test_mjpeg_capture_skips_non_jpeg_buffers():
+    jpegs = [encode(scene(part=False)), encode(scene())]
+    capture = MjpegCapture()
+    capture.cap = FakeCap([b"\x00" * 64, jpegs[0], b"YUYV" * 16, b"YUYV" * 16, jpegs[1]])
+    assert read_all(capture) == jpegs
+
+
+def test_mjpeg_capture_gives_up_after_max_bad_frames():
+    capture = MjpegCapture()
+    capture.cap = FakeCap([b"YUYV" * 16] * (MAX_BAD_FRAMES + 5) + [encode(scene())])
+    assert capture.read() == (None, None)
+    assert capture.cap.reads == MAX_BAD_FRAMES
+
+
+def test_decoded_file_frames_drive_motion_trigger(tmp_path):
+    path = tmp_path / "recording.mjpeg"
+    write_mjpeg(path, still(scene(part=False)) + place_and_remove() + place_and_remove())
+
+    capture = MjpegFileCapture(str(path), fps=0, loop=False)
+    assert capture.open()
+    trigger = MotionTrigger(still_frames=5, background=decode_for_motion(encode(scene(part=False))))
+    captures = 0
+    for jpeg_bytes in read_all(capture):
+        frame = decode_for_motion(jpeg_bytes)
+        assert frame.shape == (120, 160)
+        captures += trigger.feed(frame)
+    assert captures == 2
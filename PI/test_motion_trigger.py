@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+
+from webcam_example import MotionTrigger
+
+PART = ((260, 160), (380, 320))   # 작업물 위치 (좌상단, 우하단)
+
+
+def scene(part=True, hand=None):
+    """빈 작업대에 작업물과 손(흰 사각형)을 그린 합성 프레임을 만듭니다."""
+    frame = np.full((480, 640, 3), 40, np.uint8)
+    if part:
+        cv2.rectangle(frame, PART[0], PART[1], (0, 200, 0), -1)
+    if hand is not None:
+        x, y, w, h = hand
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 255, 255), -1)
+    return frame
+
+
+def run(frames, background=None):
+    if background is None:
+        background = scene(part=False)
+    trigger = MotionTrigger(still_frames=5, background=background)
+    return sum(trigger.feed(frame) for frame in frames)
+
+
+def place_and_remove():
+    """손으로 작업물을 놓고 정지한 뒤, 다시 치워 빈 작업대로 정지합니다."""
+    frames = [scene(hand=(260 + i * 40, 160, 120, 160)) for i in range(6, 0, -1)]
+    frames += still(scene())
+    frames += [scene(part=False, hand=(260 + i * 40, 160, 120, 160)) for i in range(1, 7)]
+    frames += still(scene(part=False))
+    return frames
+
+
+def still(frame, n=10):
+    return [frame] * n
+
+
+def test_identical_unit_swapped_by_hand_is_inspected_again():
+    frames = still(scene(part=False))
+    # 작업물 A가 들어와서 정지
+    frames += [scene(hand=(260 + i * 40, 160, 120, 160)) for i in range(6, 0, -1)]
+    frames += still(scene())
+    # 손이 작업물을 가린 채 같은 모양의 작업물 B로 교체 (빈 작업대로 정지하지 않음)
+    frames += [scene(hand=(200 + i * 10, 120, 240, 240)) for i in range(4)]
+    frames += [scene(hand=(420 + i * 60, 120, 240, 240)) for i in range(4)]
+    frames += still(scene())
+    assert run(frames) == 2
+
+
+def test_hand_passing_without_touching_part_does_not_resend():
+    frames = still(scene(part=False))
+    frames += [scene(hand=(260 + i * 40, 160, 120, 160)) for i in range(6, 0, -1)]
+    frames += still(scene())
+    # 작업물을 가리지 않고 손이 화면 아래쪽을 지나감
+    frames += [scene(hand=(i * 80, 380, 100, 80)) for i in range(6)]
+    frames += still(scene())
+    assert run(frames) == 1
+
+
+def test_unit_present_at_startup_is_not_used_as_background():
+    frames = still(scene())
+    frames += [scene(part=False, hand=(260 + i * 40, 160, 120, 160)) for i in range(1, 7)]
+    frames += still(scene(part=False))
+    for _ in range(3):
+        frames += place_and_remove()
+
+    # 기준 장면이 없으면 아무것도 보내지 않습니다.
+    trigger = MotionTrigger(still_frames=5)
+    assert not any(trigger.feed(frame) for frame in frames)
+
+    # 작업대를 비웠을 때 보정하면 이후 놓인 작업물만 촬영합니다.
+    trigger = MotionTrigger(still_frames=5)
+    captured = []
+    for i, frame in enumerate(frames):
+        if i == 25:  # 시작할 때 있던 작업물을 치운 직후
+            trigger.request_calibration()
+        if trigger.feed(frame):
+            captured.append("PART" if frame[240, 320, 1] == 200 else "EMPTY")
+    assert captured == ["PART"] * 3
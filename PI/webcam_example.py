@@ -1,48 +1,279 @@
+import os
+import threading
 import cv2
 import logging
+import requests
 from flask import Flask, Response
 
+from capture import decode_for_motion, open_capture
+
 # --- 로깅 설정 ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# --- 설정 ---
+# 0은 시스템의 기본 웹캠을 의미합니다.
+# 만약 다른 카메라를 사용하려면 1, 2 등으로 바꿀 수 있습니다.
+CAMERA_INDEX = int(os.getenv("CAMERA_INDEX", "0"))
+# mjpeg: 카메라의 MJPEG 출력을 그대로 전달 (미지원 시 opencv로 대체), opencv: 디코딩 후 JPEG 재인코딩
+CAPTURE_BACKEND = os.getenv("CAPTURE_BACKEND", "mjpeg")
+# 카메라 대신 녹화된 MJPEG 파일을 재생하려면 경로를 지정합니다.
+CAMERA_SOURCE = os.getenv("CAMERA_SOURCE")
+
+# 자동 촬영 모드 (GPIO 버튼 대신 작업물이 정지했을 때 자동으로 검사를 요청)
+AUTO_CAPTURE = os.getenv("AUTO_CAPTURE", "0") == "1"
+AI_SERVER_URL = os.getenv("AI_SERVER_URL", "http://127.0.0.1:8000")
+ROOM_ID = os.getenv("ROOM_ID")
+AUTH_TOKEN = os.getenv("AUTH_TOKEN")
+
+# 움직임 감지 파라미터
+MOTION_SIZE = (160, 120)       # 프레임 차분을 계산할 저해상도 크기
+PIXEL_DIFF_THRESHOLD = 25      # 픽셀 밝기 차이가 이 값보다 크면 '변화'로 간주
+MOTION_RATIO = float(os.getenv("MOTION_RATIO", "0.01"))  # 연속 프레임 간 변화 비율이 이 값을 넘으면 움직임
+CHANGE_RATIO = float(os.getenv("CHANGE_RATIO", "0.03"))  # 기준 장면과의 변화 비율이 이 값을 넘으면 새 작업물
+STILL_FRAMES = int(os.getenv("STILL_FRAMES", "15"))      # 이 프레임 수만큼 정지해 있어야 촬영
+MOTION_RESET_FRAMES = int(os.getenv("MOTION_RESET_FRAMES", "30"))  # 움직임이 이만큼 이어지면 작업물이 바뀌었을 수 있다고 판단
+COVER_RATIO = float(os.getenv("COVER_RATIO", "0.5"))     # 촬영한 작업물 영역이 이 비율 이상 가려지면 작업물이 바뀌었을 수 있다고 판단
+# 빈 작업대 사진 경로. 없으면 작업대를 비운 뒤 POST /calibrate 로 기준 장면을 지정해야 자동 촬영이 시작됩니다.
+BACKGROUND_IMAGE = os.getenv("BACKGROUND_IMAGE")
+
 # --- Flask 앱 초기화 ---
 app = Flask(__name__)
 
-def frame_generator():
-    """OpenCV를 사용하여 웹캠 프레임을 생성합니다."""
-    # 0은 시스템의 기본 웹캠을 의미합니다.
-    # 만약 다른 카메라를 사용하려면 1, 2 등으로 바꿀 수 있습니다.
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        logging.error("웹캠을 열 수 없습니다. 카메라가 연결되어 있는지, 다른 프로그램에서 사용 중이지 않은지 확인하세요.")
-        # 오류 메시지를 담은 이미지 프레임을 생성하여 사용자에게 문제를 알릴 수 있습니다.
-        # (여기서는 간단히 빈 응답으로 처리)
-        return
 
-    logging.info("웹캠을 성공적으로 열었습니다.")
+class MotionTrigger:
+    """
+    저해상도 프레임 차분으로 작업물의 도착과 정지를 감지합니다.
+
+    빈 작업대(배경)는 시작할 때 작업물이 놓여 있을 수 있으므로 추측하지 않고,
+    background 프레임이나 request_calibration()으로 명시적으로 지정받습니다.
+    배경이 정해진 뒤에는 움직임이 멈춘 장면이 배경과 다를 때 한 번 촬영을 요청합니다.
+    장면이 정지해 있는 동안에는 같은 장면을 다시 보내지 않지만, 움직임이 오래 이어지거나
+    손이 작업물을 가리면 같은 모양의 다음 작업물로 교체되었을 수 있으므로 다시 촬영합니다.
+    """
+
+    def __init__(self, motion_ratio=MOTION_RATIO, change_ratio=CHANGE_RATIO, still_frames=STILL_FRAMES,
+                 motion_reset_frames=MOTION_RESET_FRAMES, cover_ratio=COVER_RATIO, background=None):
+        self.motion_ratio = motion_ratio
+        self.change_ratio = change_ratio
+        self.still_frames = still_frames
+        self.motion_reset_frames = motion_reset_frames
+        self.cover_ratio = cover_ratio
+        self.prev = None
+        self.background = None if background is None else self._preprocess(background)
+        self.calibration_requested = False
+        self.last_captured = None
+        self.part_mask = None  # 마지막으로 촬영한 작업물이 차지하는 영역
+        self.still_count = 0
+        self.motion_count = 0
+        self.armed = True  # 마지막 판정 이후 움직임이 있었는지 여부
+
+    @staticmethod
+    def _preprocess(frame):
+        small = cv2.resize(frame, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    @staticmethod
+    def _diff_mask(a, b):
+        diff = cv2.absdiff(a, b)
+        _, mask = cv2.threshold(diff, PIXEL_DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
+        return mask
+
+    @classmethod
+    def _diff_ratio(cls, a, b):
+        mask = cls._diff_mask(a, b)
+        return cv2.countNonZero(mask) / mask.size
+
+    def _covers_part(self, current) -> bool:
+        """현재 프레임에서 마지막으로 촬영한 작업물 영역이 cover_ratio 이상 달라졌는지 확인합니다."""
+        part_pixels = cv2.countNonZero(self.part_mask)
+        if part_pixels == 0:
+            return False
+        changed = cv2.bitwise_and(self._diff_mask(current, self.last_captured), self.part_mask)
+        return cv2.countNonZero(changed) / part_pixels >= self.cover_ratio
+
+    def _forget_capture(self):
+        self.last_captured = None
+        self.part_mask = None
+
+    def feed(self, frame) -> bool:
+        """프레임을 하나 받아, 지금 촬영해야 하면 True를 반환합니다."""
+        current = self._preprocess(frame)
+        prev, self.prev = self.prev, current
+        if prev is None:
+            return False
+
+        if self._diff_ratio(current, prev) > self.motion_ratio:
+            self.still_count = 0
+            self.motion_count += 1
+            self.armed = True
+            # 작업물이 교체되었을 수 있으면 중복 검사를 해제합니다.
+            if self.last_captured is not None and (
+                    self.motion_count >= self.motion_reset_frames or self._covers_part(current)):
+                self._forget_capture()
+            return False
+
+        self.motion_count = 0
+        self.still_count += 1
+        if self.still_count < self.still_frames:
+            return False
+
+        if self.calibration_requested:
+            logging.info("빈 작업대 장면을 기준으로 저장했습니다.")
+            self.background = current
+            self.calibration_requested = False
+            self._forget_capture()
+            self.armed = False
+            return False
+        if self.background is None:
+            # 기준 장면이 없으면 무엇이 작업물인지 알 수 없으므로 촬영하지 않습니다.
+            return False
+
+        if not self.armed:
+            return False
+        # 장면이 안정되었으므로 한 번만 판정합니다.
+        self.armed = False
+
+        if self._diff_ratio(current, self.background) < self.change_ratio:
+            # 작업물이 치워졌습니다. 배경을 갱신하고 다음 작업물을 기다립니다.
+            self.background = current
+            self._forget_capture()
+            return False
+
+        if self.last_captured is not None and self._diff_ratio(current, self.last_captured) < self.change_ratio:
+            # 정지한 채로 이미 검사한 장면입니다. 다시 전송하지 않습니다.
+            return False
+
+        self.last_captured = current
+        self.part_mask = self._diff_mask(current, self.background)
+        return True
+
+
+    def request_calibration(self):
+        """다음에 정지한 장면을 빈 작업대(배경)로 사용합니다. 작업대를 비운 상태에서 호출해야 합니다."""
+        self.calibration_requested = True
 
+
+def submit_snapshot(jpeg_bytes: bytes):
+    """촬영한 JPEG를 AI 서버의 /analyze 로 전송하고 결과를 기록합니다."""
+    if not ROOM_ID or not AUTH_TOKEN:
+        logging.error("ROOM_ID 또는 AUTH_TOKEN 환경 변수가 설정되지 않아 검사를 요청할 수 없습니다.")
+        return
     try:
-        while True:
-            # 프레임 읽기
-            success, frame = cap.read()
-            if not success:
-                logging.warning("프레임을 읽는 데 실패했습니다. 스트리밍을 종료합니다.")
-                break
-            else:
-                # 프레임을 JPEG 형식으로 인코딩
-                ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-                if not ret:
-                    logging.warning("프레임 인코딩에 실패했습니다.")
+        response = requests.post(
+            f"{AI_SERVER_URL}/analyze",
+            params={"roomId": ROOM_ID},
+            headers={"Authorization": f"Bearer {AUTH_TOKEN}"},
+            files={"file": ("capture.jpg", jpeg_bytes, "image/jpeg")},
+            timeout=60,
+        )
+        response.raise_for_status()
+        result = response.json()
+        logging.info(f"자동 검사 결과: {result.get('판단')} ({result.get('이유')})")
+    except requests.RequestException as e:
+        logging.error(f"자동 검사 요청 중 오류 발생: {e}")
+
+
+class Camera:
+    """
+    웹캠을 하나의 백그라운드 스레드에서 읽고, 최신 JPEG 프레임을 스트리밍 클라이언트와 공유합니다.
+    자동 촬영 모드에서는 같은 루프에서 움직임 감지도 수행합니다.
+    """
+
+    def __init__(self, index=CAMERA_INDEX, trigger=None, source=CAMERA_SOURCE, backend=CAPTURE_BACKEND):
+        self.index = index
+        self.trigger = trigger
+        self.source = source
+        self.backend = backend
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        capture = open_capture(self.index, self.source, self.backend)
+        if capture is None:
+            logging.error("웹캠을 열 수 없습니다. 카메라가 연결되어 있는지, 다른 프로그램에서 사용 중이지 않은지 확인하세요.")
+            self._stop()
+            return
+
+        logging.info("웹캠을 성공적으로 열었습니다.")
+
+        try:
+            while True:
+                # JPEG 프레임 읽기 (MJPEG 백엔드는 디코딩하지 않은 프레임을 그대로 반환)
+                frame_bytes, frame = capture.read()
+                if frame_bytes is None:
+                    logging.warning("프레임을 읽는 데 실패했습니다. 스트리밍을 종료합니다.")
+                    break
+
+                with self._cond:
+                    self._jpeg = frame_bytes
+                    self._seq += 1
+                    self._cond.notify_all()
+
+                if self.trigger is None:
                     continue
+                # 픽셀이 필요한 움직임 감지에서만 디코딩합니다.
+                if frame is None:
+                    frame = decode_for_motion(frame_bytes)
+                if frame is not None and self.trigger.feed(frame):
+                    logging.info("작업물이 정지했습니다. 자동으로 검사를 요청합니다.")
+                    threading.Thread(target=submit_snapshot, args=(frame_bytes,), daemon=True).start()
+        finally:
+            # 작업 완료 후 카메라 해제
+            logging.info("웹캠을 해제합니다.")
+            capture.release()
+            self._stop()
+
+    def _stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def frames(self):
+        """새 JPEG 프레임이 들어올 때마다 yield 합니다."""
+        seq = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._seq != seq or not self._running)
+                if self._seq == seq:
+                    return
+                seq, frame_bytes = self._seq, self._jpeg
+            yield frame_bytes
+
 
-                # 바이트 스트림으로 변환하여 yield
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-    finally:
-        # 작업 완료 후 카메라 해제
-        logging.info("웹캠을 해제합니다.")
-        cap.release()
+def create_trigger():
+    background = None
+    if BACKGROUND_IMAGE:
+        background = cv2.imread(BACKGROUND_IMAGE)
+        if background is None:
+            logging.error(f"빈 작업대 사진을 읽을 수 없습니다: {BACKGROUND_IMAGE}")
+    if background is None:
+        logging.warning("빈 작업대 기준 장면이 없습니다. 작업대를 비운 뒤 POST /calibrate 를 호출해야 자동 촬영이 시작됩니다.")
+    return MotionTrigger(background=background)
+
+
+camera = Camera(trigger=create_trigger() if AUTO_CAPTURE else None)
+
+
+def frame_generator():
+    """공유 카메라에서 MJPEG 스트림 프레임을 생성합니다."""
+    camera.start()
+    for frame_bytes in camera.frames():
+        # 바이트 스트림으로 변환하여 yield
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
 
 @app.route("/")
@@ -66,6 +297,14 @@ def index():
     </html>
     """
 
+@app.route("/calibrate", methods=["POST"])
+def calibrate():
+    """작업대를 비운 상태에서 호출하면, 다음에 정지한 장면을 빈 작업대 기준으로 저장합니다."""
+    if camera.trigger is None:
+        return {"message": "자동 촬영 모드가 꺼져 있습니다."}, 400
+    camera.trigger.request_calibration()
+    return {"message": "다음에 정지한 장면을 빈 작업대로 저장합니다."}
+
 @app.route("/video_feed")
 def video_feed():
     """비디오 스트리밍 경로."""
@@ -74,6 +313,9 @@ def video_feed():
 # --- 메인 실행 ---
 if __name__ == "__main__":
     try:
+        if AUTO_CAPTURE:
+            logging.info(f"자동 촬영 모드를 시작합니다. (room {ROOM_ID}, 정지 {STILL_FRAMES} 프레임)")
+            camera.start()
         logging.info("Flask 서버를 시작합니다. http://127.0.0.1:5001 로 접속하세요.")
         # threaded=True 옵션은 여러 클라이언트의 동시 접속을 원활하게 처리합니다.
         app.run(host="0.0.0.0", port=5001, threaded=True)